@@ -1,19 +1,147 @@
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
+
+import torch
 import whisper
 
+# Loaded Whisper models, keyed by (model size, precision), so repeated calls skip reloading weights
+_MODELS = {}
+
+# fp16: half precision on GPU (Whisper's default; CPU falls back to fp32)
+# int8: dynamically quantized Linear layers, CPU only
+# fp32: full precision everywhere
+PRECISIONS = ("fp16", "int8", "fp32")
+
+# Files decoded (ffmpeg) and converted to log-mel concurrently in batch mode
+ASR_CONCURRENCY = int(os.environ.get("ASR_CONCURRENCY", 3))
+
+# 30 s windows decoded per forward pass in batch mode
+ASR_BATCH_SIZE = int(os.environ.get("ASR_BATCH_SIZE", 8))
+
+# Silence check for batched windows, same rule and defaults as model.transcribe:
+# skip when no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOGPROB_THRESHOLD
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+def _quantize_int8(model):
+    """
+    Dynamically quantize the Linear layers of a CPU Whisper model to int8.
+
+    Whisper's layers are whisper.model.Linear, a subclass that quantize_dynamic
+    does not match, so they are swapped for plain nn.Linear (sharing weights) first.
+    """
+    def to_plain_linear(module):
+        for name, child in module.named_children():
+            if isinstance(child, whisper.model.Linear):
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(module, name, linear)
+            else:
+                to_plain_linear(child)
+
+    to_plain_linear(model)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if not any(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in model.modules()):
+        raise RuntimeError("int8 quantization did not convert any Linear layer")
+    return model
+
+
+def _get_model(size: str = "small", precision: str = "fp16"):
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+    key = (size, precision)
+    if key not in _MODELS:
+        print(f"Loading Whisper model ({size}, {precision})...")
+        if precision == "int8":
+            model = _quantize_int8(whisper.load_model(size, device="cpu"))
+        else:
+            model = whisper.load_model(size)
+        _MODELS[key] = model
+    return _MODELS[key]
+
 
-def transcribe_audio(audio_path: str) -> str:
-    print("Loading Whisper model (small)...")
-    model = whisper.load_model("small")
+def unload_models() -> None:
+    """Drop cached Whisper models so their (GPU) memory can be reclaimed."""
+    _MODELS.clear()
+
+
+def _load_mel_windows(audio_path: str, n_mels: int) -> list:
+    """Decode one file and return the log-mel spectrograms of its 30 s windows."""
+    print(f"Transcribing audio: {audio_path}")
+    audio = whisper.load_audio(audio_path)
+    mels = []
+    for start in range(0, max(len(audio), 1), whisper.audio.N_SAMPLES):
+        segment = whisper.pad_or_trim(audio[start:start + whisper.audio.N_SAMPLES])
+        mels.append(whisper.log_mel_spectrogram(segment, n_mels=n_mels))
+    return mels
+
+
+def _transcribe_batch(model, audio_paths: List[str], batch_size: int = ASR_BATCH_SIZE, fp16: bool = True) -> List[str]:
+    """
+    Transcribe several files by cutting each into 30 s windows and decoding
+    the log-mel windows of all files together, batch_size windows per pass.
+    Windows are decoded independently (no conditioning on previous text) and
+    cut hard at 30 s with no overlap, so a word on a window edge can be split.
+    Windows judged silent are skipped, as model.transcribe does.
+    """
+    # ffmpeg decoding and the STFT release the GIL, so files are prepared on a
+    # small thread pool; map keeps the results in input order
+    with ThreadPoolExecutor(max_workers=ASR_CONCURRENCY) as ex:
+        per_file = list(ex.map(lambda path: _load_mel_windows(path, model.dims.n_mels), audio_paths))
+    # (file index, log-mel window) for every window of every file
+    windows = [(file_idx, mel) for file_idx, mels in enumerate(per_file) for mel in mels]
+
+    options = whisper.DecodingOptions(fp16=fp16 and model.device.type == "cuda")
+    texts = [[] for _ in audio_paths]
+    for i in range(0, len(windows), batch_size):
+        batch = windows[i:i + batch_size]
+        mel = torch.stack([m for _, m in batch]).to(model.device)
+        for (file_idx, _), res in zip(batch, whisper.decode(model, mel, options)):
+            # silent windows (e.g. the zero-padded tail) otherwise yield hallucinated text
+            if res.no_speech_prob > NO_SPEECH_THRESHOLD and res.avg_logprob < LOGPROB_THRESHOLD:
+                continue
+            texts[file_idx].append(res.text.strip())
+
+    return [" ".join(t).strip() for t in texts]
+
+
+def transcribe_audio(audio_path: Union[str, List[str]], model_size: str = "small", model=None,
+                     batch_size: int = ASR_BATCH_SIZE, precision: str = "fp16",
+                     batch_windows: bool = False) -> Union[str, List[str]]:
+    if model is None:
+        model = _get_model(model_size, precision)
+    fp16 = precision == "fp16"
+
+    # A list of files is decoded in batches and returns one transcript per file
+    if not isinstance(audio_path, str):
+        return _transcribe_batch(model, list(audio_path), batch_size=batch_size, fp16=fp16)
+
+    # Long single file: decode its 30 s windows batch_size at a time instead of
+    # one after another (trades cross-window text conditioning for throughput)
+    if batch_windows:
+        return _transcribe_batch(model, [audio_path], batch_size=batch_size, fp16=fp16)[0]
 
     print(f"Transcribing audio: {audio_path}")
-    result = model.transcribe(audio_path)
+    result = model.transcribe(audio_path, fp16=fp16)
 
     transcript = result["text"]
     return transcript
 
 
 def main():
+    if len(sys.argv) > 2:
+        audio_files = sys.argv[1:]
+        transcripts = transcribe_audio(audio_files)
+        for audio_file, transcript in zip(audio_files, transcripts):
+            print(f"\n=== FINAL TRANSCRIPT: {audio_file} ===\n")
+            print(transcript)
+        print("\n========================\n")
+        return
+
     if len(sys.argv) > 1:
         audio_file = sys.argv[1]
     else:
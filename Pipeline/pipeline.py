@@ -1,8 +1,10 @@
 from pathlib import Path
 import sys
-import json
+import gc
 import os
 
+import torch
+
 # ---------------------------
 # Make project root importable
 # ---------------------------
@@ -13,31 +15,39 @@ if str(PROJECT_ROOT) not in sys.path:
 # ---------------------------
 # Imports from your folders
 # ---------------------------
-from ASR.transcribe_call import transcribe_audio
-from Segment.segment_cases_ml import segment_transcript
+from ASR.transcribe_call import transcribe_audio, unload_models as unload_asr_models
+from Segment.segment_cases_ml import segment_transcript, unload_models as unload_segment_models
 from Summary.summarize_cases import process_cases  # improved summarizer (Option A default)
+from Summary.json_io import WRITE_BUFFER_SIZE, json_text, read_json, write_json
 
 # local path to the original uploaded project export (kept as metadata)
 SOURCE_EXPORT_PATH = "/mnt/data/AIPRM-export-chatgpt-thread_Call-center-case-segmentation_2025-11-20T23_27_47.292Z.md"
 
-
-def write_json(path, data):
-    with open(path, "w", encoding="utf-8") as fh:
-        json.dump(data, fh, ensure_ascii=False, indent=2)
+def release_gpu_memory():
+    """Collect dropped models and hand cached CUDA blocks back so the next stage's model fits."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
 
 
 def write_csv(path, rows, fieldnames):
     """
     Lightweight CSV writer that does not require pandas.
-    rows: list of dict
+    rows: list of dict, each containing every key in fieldnames
     fieldnames: list of columns in order
     """
     import csv
-    with open(path, "w", encoding="utf-8", newline='') as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction='ignore')
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+    from operator import itemgetter
+    # every row carries all fieldnames; fetch them as one ordered tuple per row
+    get_row = itemgetter(*fieldnames)
+    if len(fieldnames) == 1:
+        row_values = (lambda r: (get_row(r),))
+    else:
+        row_values = get_row
+    with open(path, "w", encoding="utf-8", newline='', buffering=WRITE_BUFFER_SIZE) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(fieldnames)
+        writer.writerows(row_values(r) for r in rows)
 
 
 def write_xlsx(path, rows, fieldnames):
@@ -66,28 +76,53 @@ def run_pipeline(audio_path,
                  sim_threshold=0.28,
                  min_segment_words=35,
                  enable_classification=False,
-                 summarizer_model="sshleifer/distilbart-cnn-12-6"):
+                 summarizer_model="sshleifer/distilbart-cnn-12-6",
+                 release_models=True,
+                 formats=("json", "csv"),
+                 asr_precision="fp16",
+                 asr_batch_windows=False):
     """
     Full pipeline:
     1) ASR -> transcript
     2) Segmentation -> cases.json
     3) Summarization -> summaries.json
-    4) Compose outputs -> pipeline_output.json / .csv / .xlsx
+    4) Compose outputs -> pipeline_output.json / .csv / .xlsx (as listed in formats)
+
+    XLSX is opt-in: pass formats=("json", "csv", "xlsx"); pandas is only
+    imported when it is requested.
+
+    asr_precision selects the Whisper weights/compute: "fp16" (GPU half
+    precision, the Whisper default), "int8" (quantized, CPU) or "fp32".
+    asr_batch_windows=True decodes the audio's 30 s windows in batches
+    (faster on GPU, without conditioning each window on the previous text).
+    With release_models=True each stage's model is dropped and the CUDA cache
+    emptied before the next stage loads, so the three models are never resident
+    together on the GPU.
     """
 
     # 1) ASR
     print("Running ASR...")
-    transcript = transcribe_audio(audio_path)
+    try:
+        transcript = transcribe_audio(audio_path, precision=asr_precision, batch_windows=asr_batch_windows)
+    finally:
+        if release_models:
+            unload_asr_models()
+            release_gpu_memory()
 
     # 2) Segmentation
     print("Segmenting transcript...")
-    segments = segment_transcript(
-        transcript,
-        merge_min_words=merge_min_words,
-        smooth_window=smooth_window,
-        sim_threshold=sim_threshold,
-        min_segment_words=min_segment_words
-    )
+    try:
+        segments = segment_transcript(
+            transcript,
+            merge_min_words=merge_min_words,
+            smooth_window=smooth_window,
+            sim_threshold=sim_threshold,
+            min_segment_words=min_segment_words
+        )
+    finally:
+        if release_models:
+            unload_segment_models()
+            release_gpu_memory()
 
     # Save intermediate cases.json
     cases_obj = {"cases": segments}
@@ -97,17 +132,20 @@ def run_pipeline(audio_path,
     # 3) Summarization using Summary.summarize_cases.process_cases
     # NOTE: your summarize_cases.py should accept 'classify=' for classification toggle
     print("Summarizing segments...")
-    process_cases(
-        "cases.json",
-        "summaries.json",
-        model_name=summarizer_model,
-        max_len=None,
-        classify=enable_classification,
-    )
+    try:
+        process_cases(
+            "cases.json",
+            "summaries.json",
+            model_name=summarizer_model,
+            max_len=None,
+            classify=enable_classification,
+        )
+    finally:
+        if release_models:
+            release_gpu_memory()
 
     # 4) Load summaries and combine into pipeline output
-    with open("summaries.json", "r", encoding="utf-8") as fh:
-        summary_entries = json.load(fh)
+    summary_entries = read_json("summaries.json")
 
     pipeline_out = []
     for entry in summary_entries:
@@ -126,8 +164,12 @@ def run_pipeline(audio_path,
         pipeline_out.append(item)
 
     # 5) Write JSON
-    write_json("pipeline_output.json", pipeline_out)
-    print("Saved pipeline_output.json")
+    if "json" in formats:
+        write_json("pipeline_output.json", pipeline_out)
+        print("Saved pipeline_output.json")
+
+    if "csv" not in formats and "xlsx" not in formats:
+        return pipeline_out
 
     # 6) Write CSV (flatten non-scalar fields like flags into JSON strings)
     # Build rows with stable columns
@@ -137,9 +179,12 @@ def run_pipeline(audio_path,
     csv_fieldnames += ["source_export"]
 
     # prepare rows for CSV (stringify complex types)
-    import json as _json
+    if enable_classification:
+        flags_strs = [json_text(r.get("flags", {})) for r in pipeline_out]
+    else:
+        flags_strs = [None] * len(pipeline_out)
     csv_rows = []
-    for r in pipeline_out:
+    for r, flags_str in zip(pipeline_out, flags_strs):
         row = {
             "case_index": r.get("case_index"),
             "text": r.get("text", ""),
@@ -148,22 +193,24 @@ def run_pipeline(audio_path,
         }
         if enable_classification:
             row["category"] = r.get("category", "")
-            row["flags"] = _json.dumps(r.get("flags", {}), ensure_ascii=False)
+            row["flags"] = flags_str
             row["risk_score"] = r.get("risk_score", 0)
         csv_rows.append(row)
 
-    write_csv("pipeline_output.csv", csv_rows, csv_fieldnames)
-    print("Saved pipeline_output.csv")
-
-    # 7) Try XLSX (best-effort)
-    try:
-        write_xlsx("pipeline_output.xlsx", csv_rows, csv_fieldnames)
-        print("Saved pipeline_output.xlsx")
-    except ImportError:
-        print("pandas not available in environment — skipping XLSX. "
-              "To enable XLSX, install pandas and openpyxl.")
-    except Exception as e:
-        print(f"Failed to write XLSX: {e}")
+    if "csv" in formats:
+        write_csv("pipeline_output.csv", csv_rows, csv_fieldnames)
+        print("Saved pipeline_output.csv")
+
+    # 7) Try XLSX (best-effort, only on demand)
+    if "xlsx" in formats:
+        try:
+            write_xlsx("pipeline_output.xlsx", csv_rows, csv_fieldnames)
+            print("Saved pipeline_output.xlsx")
+        except ImportError:
+            print("pandas not available in environment — skipping XLSX. "
+                  "To enable XLSX, install pandas and openpyxl.")
+        except Exception as e:
+            print(f"Failed to write XLSX: {e}")
 
     return pipeline_out
 
@@ -172,9 +219,16 @@ def run_pipeline(audio_path,
 # CLI entrypoint
 # ---------------------------
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python pipeline.py sample_call.wav")
-        sys.exit(1)
-    audio_file = sys.argv[1]
+    import argparse
+    ap = argparse.ArgumentParser(description="Run ASR -> segmentation -> summarization on an audio file.")
+    ap.add_argument("audio_file", help="Audio file to process, e.g. sample_call.wav")
+    ap.add_argument("--formats", nargs="+", choices=["json", "csv", "xlsx"], default=["json", "csv"],
+                    help="Output formats to write (default: json csv)")
+    ap.add_argument("--precision", choices=["fp16", "int8", "fp32"], default="fp16",
+                    help="Whisper precision: fp16 (GPU half precision), int8 (quantized, CPU) or fp32")
+    ap.add_argument("--batch-windows", action="store_true",
+                    help="Decode the audio's 30 s windows in batches (ASR_BATCH_SIZE, default 8)")
+    args = ap.parse_args()
     # You can toggle enable_classification=True to include category/flags/risk in CSV/XLSX
-    run_pipeline(audio_file)
+    run_pipeline(args.audio_file, formats=set(args.formats), asr_precision=args.precision,
+                 asr_batch_windows=args.batch_windows)
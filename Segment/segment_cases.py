@@ -12,17 +12,18 @@ BOUNDARY_PATTERNS = [
     r"\bthird\s+patient\b",
 ]
 
+# All boundary patterns fused into one case-insensitive regex (single scan per sentence)
+_BOUNDARY_RE = re.compile("|".join(f"(?:{p})" for p in BOUNDARY_PATTERNS), re.IGNORECASE)
+
 def is_boundary(sentence: str) -> bool:
     """Return True if sentence contains case boundary keywords."""
-    sentence = sentence.lower()
-    for pattern in BOUNDARY_PATTERNS:
-        if re.search(pattern, sentence):
-            return True
-    return False
+    return _BOUNDARY_RE.search(sentence) is not None
+
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
 
 def split_into_sentences(text: str):
     """Naive sentence splitter – later we switch to spaCy."""
-    return re.split(r'(?<=[.!?])\s+', text.strip())
+    return _SENT_SPLIT.split(text.strip())
 
 def segment_transcript(transcript: str):
     """Split transcript into case segments."""
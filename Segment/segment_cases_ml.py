@@ -1,15 +1,29 @@
 # segment_cases_ml.py
+import functools
 import re
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from scipy.ndimage import uniform_filter1d
 import json
 import sys
 
 # ------- Helpers -------
+@functools.lru_cache(maxsize=2)
+def _get_embedder(name):
+    # imported here so the pure helpers below don't need the model stack
+    from sentence_transformers import SentenceTransformer
+    # SentenceTransformer picks CUDA by itself when available
+    return SentenceTransformer(name)
+
+def unload_models():
+    """Drop cached embedding models so their (GPU) memory can be reclaimed."""
+    _get_embedder.cache_clear()
+
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
 def split_into_sentences(text: str):
-    # naive but practical for transcripts
-    sents = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s.strip() for s in sents if s.strip()]
+    # naive but practical for transcripts; the greedy \s+ split leaves no
+    # whitespace around pieces of stripped text, so only empties need dropping
+    return [s for s in _SENT_SPLIT.split(text.strip()) if s]
 
 def merge_short_sentences(sentences, min_words=6):
     merged = []
@@ -27,31 +41,22 @@ def merge_short_sentences(sentences, min_words=6):
     return merged
 
 def batch_encode(embedder, sentences, batch_size=32):
-    embs = []
-    for i in range(0, len(sentences), batch_size):
-        batch = sentences[i:i+batch_size]
-        emb = embedder.encode(batch, show_progress_bar=False)
-        embs.append(emb)
-    return np.vstack(embs)
+    # encode() batches internally; unit-length embeddings make cosine a plain dot product
+    return embedder.encode(sentences, batch_size=batch_size, show_progress_bar=False,
+                           convert_to_numpy=True, normalize_embeddings=True)
 
 def cosine_similarities(embeddings):
-    # pairwise consecutive cosine similarities
-    sims = []
-    for i in range(1, len(embeddings)):
-        a = embeddings[i-1]
-        b = embeddings[i]
-        denom = (np.linalg.norm(a) * np.linalg.norm(b))
-        sim = 0.0 if denom == 0 else float(np.dot(a, b) / denom)
-        sims.append(sim)
-    return np.array(sims)
+    # pairwise consecutive cosine similarities; norms are computed once so
+    # non-normalized embeddings are handled too (zero vectors give 0.0)
+    norms = np.linalg.norm(embeddings, axis=1)
+    dots = np.einsum('ij,ij->i', embeddings[:-1], embeddings[1:])
+    return dots / (norms[:-1] * norms[1:] + 1e-12)
 
 def smooth(array, window=3):
     if window <= 1:
         return array
-    pad = window // 2
-    padded = np.pad(array, (pad, pad), mode='edge')
-    sm = np.convolve(padded, np.ones(window)/window, mode='valid')
-    return sm
+    # running-mean filter with edge replication, O(N) regardless of window
+    return uniform_filter1d(np.asarray(array, dtype=float), size=window, mode='nearest')
 
 def find_boundaries(smoothed_sims, threshold=0.28):
     # boundary at positions where sim drops below threshold
@@ -70,44 +75,35 @@ def enforce_min_segment_length(sentences, boundaries, min_words=30):
     """
     Merge segments that are too short (in word-count) into neighbor.
     boundaries are indices in sims (i.e. between sentence i and i+1).
+    A short segment is merged into the previous one; a short leading
+    segment absorbs the following ones until it is long enough.
     """
+    # word counts as prefix sums: words in sentences[s..e] = cum[e+1] - cum[s]
+    cum = np.concatenate(([0], np.cumsum([len(s.split()) for s in sentences]))).tolist()
+
     # build segments as list of (start_idx, end_idx inclusive)
-    segs = []
-    start = 0
-    for b in boundaries:
-        end = b  # boundary before sentence b+1 => include sentence b
-        segs.append((start, end))
-        start = b+1
-    segs.append((start, len(sentences)-1))
-
-    # compute word counts
-    def seg_word_count(seg):
-        s,e = seg
-        return sum(len(sentences[i].split()) for i in range(s, e+1))
-
-    i = 0
-    while i < len(segs):
-        if seg_word_count(segs[i]) < min_words:
-            # merge with previous if exists else next
-            if i > 0:
-                # merge into previous
-                s_prev, e_prev = segs[i-1]
-                s_cur, e_cur = segs[i]
-                segs[i-1] = (s_prev, e_cur)
-                segs.pop(i)
-                i = max(i-1, 0)
-            elif i+1 < len(segs):
-                # merge into next
-                s_cur, e_cur = segs[i]
-                s_next, e_next = segs[i+1]
-                segs[i] = (s_cur, e_next)
-                segs.pop(i+1)
-            else:
-                # single tiny segment, nothing to merge
-                i += 1
+    starts = [0] + [b + 1 for b in boundaries]
+    ends = list(boundaries) + [len(sentences) - 1]
+
+    merged = []    # finalized (start, end, words); all but a lone tiny segment reach min_words
+    carry = None   # leading short segment still absorbing its successors
+    for s, e in zip(starts, ends):
+        words = cum[e + 1] - cum[s]
+        if carry is not None:
+            s, words = carry[0], carry[2] + words
+            carry = None
+        if words >= min_words:
+            merged.append((s, e, words))
+        elif merged:
+            # merge into previous
+            s_prev, _, w_prev = merged[-1]
+            merged[-1] = (s_prev, e, w_prev + words)
         else:
-            i += 1
-    return segs
+            carry = (s, e, words)
+    if carry is not None:
+        # single tiny segment, nothing to merge
+        merged.append(carry)
+    return [(s, e) for s, e, _ in merged]
 
 # ------- Main segmentation function -------
 def segment_transcript(transcript,
@@ -128,7 +124,7 @@ def segment_transcript(transcript,
         return [" ".join(sentences)]
 
     # embeddings
-    embedder = SentenceTransformer(embed_model)
+    embedder = _get_embedder(embed_model)
     embeddings = batch_encode(embedder, sentences, batch_size=64)
 
     sims = cosine_similarities(embeddings)  # len = n_sentences-1
@@ -0,0 +1,42 @@
+"""
+JSON read/write helpers shared by the summarization scripts and the pipeline.
+
+orjson is used when installed and the standard library json module otherwise;
+both produce the same indent=2 layout.
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson  # Rust-backed JSON encoder/decoder (optional)
+except ImportError:
+    orjson = None
+
+# 1 MiB write buffer: far fewer write() syscalls than the 8 KiB default for large outputs
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def read_json(path) -> Any:
+    if orjson is not None:
+        return orjson.loads(Path(path).read_bytes())
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def write_json(path, data: Any) -> None:
+    if orjson is not None:
+        with open(path, "wb", buffering=WRITE_BUFFER_SIZE) as fh:
+            fh.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
+
+
+def json_text(value: Any) -> str:
+    """Serialize a value to a compact JSON string (e.g. for a single CSV/XLSX cell)."""
+    if orjson is not None:
+        return orjson.dumps(value).decode("utf-8")
+    # compact separators so the stdlib output matches orjson byte for byte
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
@@ -11,9 +11,15 @@ Produces:
  - pipeline_output_clean.xlsx (if pandas available)
 """
 
-import json, re, argparse, csv
+import re, argparse, csv, os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+try:
+    from Summary.json_io import WRITE_BUFFER_SIZE, json_text, read_json, write_json
+except ImportError:  # run as a script from inside Summary/
+    from json_io import WRITE_BUFFER_SIZE, json_text, read_json, write_json
+
 # simple intent mapping from keywords -> short factual sentence
 INTENT_RULES = [
     (r"\banydesk\b|\bany desk\b|\bteamviewer\b", "Agent asks user to install a remote-access app (AnyDesk/TeamViewer) and provide the connection code."),
@@ -24,28 +30,39 @@ INTENT_RULES = [
     (r"\bfull access\b|\bpermissions\b|\bcontrol your\b|\bcontrol your phone\b", "Agent requests broad permissions / full access to device."),
     (r"\bcode\b|\baccess code\b|\baccess id\b|\b\d{3,}\b", "Agent requests numeric access codes or connection IDs."),
 ]
+COMPILED_INTENT_RULES = [(re.compile(pattern), intent_sent) for pattern, intent_sent in INTENT_RULES]
+
+# below this many entries a process pool costs more to start than it saves
+PARALLEL_MIN_ENTRIES = 256
 
 # patterns to remove/harden
 URL_RE = re.compile(r"https?://\S+|\bwww\.\S+\b", flags=re.I)
 MULTI_WHITESPACE = re.compile(r"\s+")
 REPEATED_PHRASE = re.compile(r"\b(\w+(?:\s+\w+){0,4})(?:\s+\1){1,}", flags=re.I)  # collapse small repeated phrases
+MARKER_RE = re.compile(r"={3,}.*?={3,}")
+HORIZONTAL_WHITESPACE = re.compile(r"[ \t\r\f\v]+")
+PUNCT_SPACING = re.compile(r"\s*([.,!?])\s*")
+MULTI_DOT = re.compile(r"[.]{2,}")
+REPEATED_SENTENCE_END = re.compile(r"(\. ){2,}")
+INSTRUCTION_VERBS = re.compile(r"\b(click|open|install|download|scan|press|accept|start|give)\b", flags=re.I)
+TRAILING_JUNK = re.compile(r"[^A-Za-z0-9\.\,\?\! ]+$")
 
 def clean_text(s: str) -> str:
     if not s: 
         return ""
     t = s
-    t = re.sub(r"={3,}.*?={3,}", "", t)
+    t = MARKER_RE.sub("", t)
     t = URL_RE.sub("", t)
     t = REPEATED_PHRASE.sub(r"\1", t)
-    t = re.sub(r"[ \t\r\f\v]+", " ", t)
-    t = re.sub(r"\s*([.,!?])\s*", r"\1 ", t).strip()
-    t = re.sub(r"[.]{2,}", ".", t)
+    t = HORIZONTAL_WHITESPACE.sub(" ", t)
+    t = PUNCT_SPACING.sub(r"\1 ", t).strip()
+    t = MULTI_DOT.sub(".", t)
     return t.strip()
 
 def detect_intent(cleaned_text: str) -> str:
     lower = cleaned_text.lower()
-    for pattern, intent_sent in INTENT_RULES:
-        if re.search(pattern, lower):
+    for pattern, intent_sent in COMPILED_INTENT_RULES:
+        if pattern.search(lower):
             return intent_sent
     return None
 
@@ -61,14 +78,14 @@ def postprocess_entry(entry: dict) -> dict:
     intent = detect_intent(cleaned)
 
     if intent:
-        if re.search(r"\b(click|open|install|download|scan|press|accept|start|give)\b", cleaned, flags=re.I) or len(cleaned.split()) > 20:
+        if INSTRUCTION_VERBS.search(cleaned) or len(cleaned.split()) > 20:
             final = intent
         else:
             final = cleaned
     else:
         final = cleaned
 
-    final = re.sub(r"(\. ){2,}", ". ", final)
+    final = REPEATED_SENTENCE_END.sub(". ", final)
     final = MULTI_WHITESPACE.sub(" ", final).strip()
 
     if not final:
@@ -77,22 +94,37 @@ def postprocess_entry(entry: dict) -> dict:
 
     final = shorten_to_sentence(final, max_words=25)
     final = final.strip()
-    final = re.sub(r"[^A-Za-z0-9\.\,\?\! ]+$", "", final).strip()
+    final = TRAILING_JUNK.sub("", final).strip()
 
     out = dict(entry)
     out["summary_clean"] = final
     return out
 
-def main(input_path: str, output_json: str, output_csv: str, output_xlsx: str=None):
+def postprocess_all(data: list, workers: int = None) -> list:
+    """Post-process all entries; large inputs are spread over a process pool (order preserved)."""
+    if workers == 1 or len(data) < PARALLEL_MIN_ENTRIES:
+        return [postprocess_entry(item) for item in data]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+        return list(ex.map(postprocess_entry, data, chunksize=64))
+
+def csv_row(entry: dict, fieldnames) -> tuple:
+    """Ordered CSV values for an entry; flags dicts are serialized as JSON."""
+    row = [entry.get(k, "") for k in fieldnames]
+    if "flags" in fieldnames and isinstance(entry.get("flags"), dict):
+        flags = entry["flags"]
+        row[fieldnames.index("flags")] = json_text(flags)
+    return tuple(row)
+
+def main(input_path: str, output_json: str, output_csv: str, output_xlsx: str=None, workers: int=None):
     p = Path(input_path)
     if not p.exists():
         raise SystemExit(f"Input file not found: {input_path}")
-    data = json.loads(p.read_text(encoding="utf-8"))
+    data = read_json(p)
 
-    processed = [postprocess_entry(item) for item in data]
+    processed = postprocess_all(data, workers=workers)
 
     # JSON
-    Path(output_json).write_text(json.dumps(processed, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_json(output_json, processed)
     print(f"Wrote cleaned JSON -> {output_json}")
 
     # CSV – FIXED QUOTES HERE
@@ -101,14 +133,10 @@ def main(input_path: str, output_json: str, output_csv: str, output_xlsx: str=No
     if "category" in sample:
         fieldnames += ["category", "risk_score", "flags"]
 
-    with open(output_csv, "w", newline='', encoding="utf-8") as fh:
-        writer = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction="ignore")
-        writer.writeheader()
-        for r in processed:
-            row = {k: r.get(k,"") for k in fieldnames}
-            if "flags" in r and isinstance(r["flags"], dict):
-                row["flags"] = json.dumps(r["flags"], ensure_ascii=False)
-            writer.writerow(row)
+    with open(output_csv, "w", newline='', encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as fh:
+        writer = csv.writer(fh)
+        writer.writerow(fieldnames)
+        writer.writerows(csv_row(r, fieldnames) for r in processed)
     print(f"Wrote cleaned CSV -> {output_csv}")
 
     # XLSX (optional)
@@ -129,5 +157,6 @@ if __name__ == "__main__":
     ap.add_argument("--out-json", dest="out_json", default="pipeline_output_clean.json")
     ap.add_argument("--out-csv", dest="out_csv", default="pipeline_output_clean.csv")
     ap.add_argument("--out-xlsx", dest="out_xlsx", default="pipeline_output_clean.xlsx")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes for large inputs (default: CPU count, 1 = serial)")
     args = ap.parse_args()
-    main(args.input_path, args.out_json, args.out_csv, args.out_xlsx)
+    main(args.input_path, args.out_json, args.out_csv, args.out_xlsx, workers=args.workers)
@@ -17,37 +17,71 @@ Reference original project export:
 """
 
 import argparse
-import json
+import functools
 import math
 import re
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import torch
-from transformers import AutoTokenizer, pipeline
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, pipeline
+
+try:
+    from Summary.json_io import read_json, write_json
+except ImportError:  # run as a script from inside Summary/
+    from json_io import read_json, write_json
+
+try:
+    import ahocorasick  # pyahocorasick: single-pass multi-keyword matching (optional)
+except ImportError:
+    ahocorasick = None
 
 # ------------------- Utility & cleaning -------------------
 
-def compute_safe_max_length(text: str, model_name: str = "sshleifer/distilbart-cnn-12-6", requested_max: int = None) -> int:
+def _safe_max_from_length(input_len: int, requested_max: int = None) -> int:
+    suggested = max(20, int(input_len * 0.45))
+    if requested_max:
+        return min(requested_max, max(20, suggested))
+    return min(200, suggested)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_tokenizer(model_name: str):
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+
+def compute_safe_max_length(text: str, model_name: str = "sshleifer/distilbart-cnn-12-6", requested_max: int = None, tokenizer=None) -> int:
     try:
-        tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        if tokenizer is None:
+            tokenizer = _get_tokenizer(model_name)
         enc = tokenizer(text, truncation=False)
         input_len = len(enc["input_ids"])
     except Exception:
         input_len = max(50, len(text.split()))
-    suggested = max(20, int(input_len * 0.45))
-    if requested_max:
-        return min(requested_max, max(20, suggested))
-    return min(200, suggested)
+    return _safe_max_from_length(input_len, requested_max)
+
+
+def token_lengths(texts: List[str], tokenizer) -> List[int]:
+    """Token count per text from a single tokenizer call (word-count estimate on failure)."""
+    try:
+        return list(tokenizer(texts, truncation=False, return_length=True)["length"])
+    except Exception:
+        return [max(50, len(t.split())) for t in texts]
+
+
+_EQ_MARK_RE = re.compile(r"={3,}.*?={3,}")
+_WS_RE = re.compile(r"\s+")
+_REPEAT_FILLER_RE = re.compile(r"\b(\w+)(?:\s+\1){2,}\b", re.IGNORECASE)
+_INSTR_RE = re.compile(r"\b(click|tap|press|select|choose|open)\b(?:[^.?!]*?){1,3}(?:[.?!])", re.I)
 
 
 def clean_text_for_model(text: str) -> str:
     """Remove transcript markers, excessive whitespace and repeated fillers."""
-    t = re.sub(r"={3,}.*?={3,}", "", text)
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _EQ_MARK_RE.sub("", text)
+    t = _WS_RE.sub(" ", t).strip()
     # collapse repeated filler words (e.g., "okay okay okay" -> "okay")
-    t = re.sub(r"\b(\w+)(?:\s+\1){2,}\b", r"\1", t, flags=re.IGNORECASE)
+    t = _REPEAT_FILLER_RE.sub(r"\1", t)
     # remove sequences of short directional instructions that don't add semantic value
-    t = re.sub(r"\b(click|tap|press|select|choose|open)\b(?:[^.?!]*?){1,3}(?:[.?!])", "", t, flags=re.I)
+    t = _INSTR_RE.sub("", t)
     t = t.strip()
     return t
 
@@ -70,15 +104,45 @@ FLAG_KEYWORDS = {
 }
 
 
+# Keywords starting with a backslash are regexes; everything else is a plain substring
+_REGEX_KEYWORDS = {kw: re.compile(kw) for kws in FLAG_KEYWORDS.values() for kw in kws if kw.startswith("\\")}
+_PLAIN_KEYWORDS = sorted({kw for table in (FLAG_KEYWORDS, CATEGORY_KEYWORDS) for kws in table.values()
+                          for kw in kws if kw not in _REGEX_KEYWORDS})
+
+
+def _build_keyword_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in _PLAIN_KEYWORDS:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _found_keywords(lower: str) -> set:
+    """All keywords (plain and regex) present in the lowercased text."""
+    if _KEYWORD_AUTOMATON is not None:
+        # one Aho-Corasick pass reports every (overlapping) keyword occurrence
+        found = {kw for _, kw in _KEYWORD_AUTOMATON.iter(lower)}
+    else:
+        found = {kw for kw in _PLAIN_KEYWORDS if kw in lower}
+    found.update(kw for kw, pattern in _REGEX_KEYWORDS.items() if pattern.search(lower))
+    return found
+
+
 def detect_flags_and_category(text: str) -> Dict[str, Any]:
     lower = text.lower()
+    found = _found_keywords(lower)
     flags = {}
     score = 0.0
     for flag, kws in FLAG_KEYWORDS.items():
-        found = any((re.search(kw, lower) if kw.startswith("\\") else kw in lower) for kw in kws)
-        flags[flag] = bool(found)
+        flags[flag] = any(kw in found for kw in kws)
     # category scoring
-    cat_scores = {cat: sum(1 for kw in kws if kw in lower) for cat, kws in CATEGORY_KEYWORDS.items()}
+    cat_scores = {cat: sum(1 for kw in kws if kw in found) for cat, kws in CATEGORY_KEYWORDS.items()}
     best_cat = max(cat_scores, key=lambda k: cat_scores[k])
     category = best_cat if cat_scores[best_cat] > 0 else "Other"
     if flags.get("remote_access"):
@@ -100,49 +164,116 @@ def detect_flags_and_category(text: str) -> Dict[str, Any]:
 
 # ------------------- Summarization -------------------
 
-def make_summarizer(model_name: str):
+def make_summarizer(model_name: str, quantize: bool = False):
     device = 0 if torch.cuda.is_available() else -1
-    # prefer text2text/summarization model
-    summarizer = pipeline("summarization", model=model_name, device=device)
+    if quantize:
+        return make_quantized_summarizer(model_name, device)
+    # prefer text2text/summarization model; half precision on GPU halves memory traffic
+    dtype = torch.float16 if device >= 0 else None
+    summarizer = pipeline("summarization", model=model_name, device=device, torch_dtype=dtype)
     return summarizer
 
 
+def make_quantized_summarizer(model_name: str, device: int):
+    """
+    Summarizer with int8 weights: bitsandbytes 8-bit loading on GPU, torch
+    dynamic quantization of the Linear layers on CPU (no extra dependency).
+    """
+    tokenizer = _get_tokenizer(model_name)
+    if device >= 0:
+        try:
+            import bitsandbytes  # noqa: F401  (needed by load_in_8bit)
+            from transformers import BitsAndBytesConfig
+        except ImportError as e:
+            raise ImportError(
+                "int8 summarization on GPU needs the bitsandbytes package "
+                "(pip install bitsandbytes); run without --quantize otherwise."
+            ) from e
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            model_name, quantization_config=BitsAndBytesConfig(load_in_8bit=True), device_map="auto"
+        )
+        # device placement is handled by device_map
+        return pipeline("summarization", model=model, tokenizer=tokenizer)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("summarization", model=model, tokenizer=tokenizer, device=device)
+
+
 def abstractive_summary(summarizer, text: str, requested_max: int = None) -> str:
-    safe_max = compute_safe_max_length(text, model_name=summarizer.model.name_or_path, requested_max=requested_max)
+    safe_max = compute_safe_max_length(text, model_name=summarizer.model.name_or_path, requested_max=requested_max,
+                                       tokenizer=getattr(summarizer, "tokenizer", None))
     chunk = text if len(text) < 3000 else text[:3000]
     try:
-        out = summarizer(chunk, max_length=safe_max, min_length=8, do_sample=False)
+        with torch.inference_mode():
+            out = summarizer(chunk, max_length=safe_max, min_length=8, do_sample=False)
         summary_text = out[0].get("summary_text", out[0].get("generated_text", "")).strip()
     except Exception:
-        summary_text = " ".join(chunk.split()[:40]) + ("..." if len(chunk.split()) > 40 else "")
-    summary_text = re.sub(r"\s+", " ", summary_text).strip()
+        summary_text = _fallback_summary(chunk)
+    summary_text = _WS_RE.sub(" ", summary_text).strip()
     return summary_text
 
+
+def _fallback_summary(chunk: str) -> str:
+    return " ".join(chunk.split()[:40]) + ("..." if len(chunk.split()) > 40 else "")
+
+
+def abstractive_summaries(summarizer, texts: List[str], requested_max: int = None, batch_size: int = 8) -> List[str]:
+    """
+    Summarize many texts in batches of similar token length.
+    Texts are sorted by length and cut into buckets of batch_size so little
+    compute is spent on padding; each bucket is one pipeline call using the
+    largest safe max_length in that bucket. Results keep the input order.
+    """
+    if not texts:
+        return []
+    chunks = [t if len(t) < 3000 else t[:3000] for t in texts]
+    lengths = token_lengths(chunks, summarizer.tokenizer)
+    order = sorted(range(len(chunks)), key=lengths.__getitem__)
+
+    summaries = [""] * len(chunks)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        bucket_chunks = [chunks[idx] for idx in bucket]
+        safe_max = max(_safe_max_from_length(lengths[idx], requested_max) for idx in bucket)
+        try:
+            with torch.inference_mode():
+                outs = summarizer(bucket_chunks, max_length=safe_max, min_length=8, do_sample=False,
+                                  batch_size=batch_size, truncation=True)
+            for idx, out in zip(bucket, outs):
+                # pipelines return one dict per input, or a one-element list when given a list
+                item = out[0] if isinstance(out, list) else out
+                summaries[idx] = item.get("summary_text", item.get("generated_text", "")).strip()
+        except Exception:
+            for idx in bucket:
+                summaries[idx] = _fallback_summary(chunks[idx])
+    return [_WS_RE.sub(" ", s).strip() for s in summaries]
+
 # ------------------- Orchestration -------------------
 
-def process_cases(input_path: str, output_path: str, model_name: str = "google/flan-t5-base", max_len: int = None, classify: bool = False):
-    with open(input_path, "r", encoding="utf-8") as fh:
-        data = json.load(fh)
+def process_cases(input_path: str, output_path: str, model_name: str = "google/flan-t5-base", max_len: int = None, classify: bool = False, batch_size: int = 8, quantize: bool = False):
+    data = read_json(input_path)
     cases = data.get("cases", [])
     if not isinstance(cases, list):
         raise ValueError("Input JSON must contain a top-level 'cases' array.")
     print(f"[+] Loaded {len(cases)} cases from {input_path}")
 
-    summarizer = make_summarizer(model_name)
+    summarizer = make_summarizer(model_name, quantize=quantize)
+
+    # Clean every case first, then send all long-enough texts to the model in length-bucketed batches
+    cleaned = [clean_text_for_model(raw_text) for raw_text in cases]
+    to_summarize = [idx for idx, text in enumerate(cleaned) if text and len(text.split()) >= 12]
+    texts = [cleaned[idx] for idx in to_summarize]
+    batch_summaries = dict(zip(to_summarize, abstractive_summaries(summarizer, texts, requested_max=max_len, batch_size=batch_size)))
 
     results = []
-    for i, raw_text in enumerate(cases, start=1):
-        text = clean_text_for_model(raw_text)
+    for i, (raw_text, text) in enumerate(zip(cases, cleaned), start=1):
         if not text:
             summary = ""
             meta = {"category": "Empty", "flags": {}, "risk_score": 0}
         else:
             # Default behavior (Option A): short factual summary
             # For very short cleaned segments, return the cleaned text
-            if len(text.split()) < 12:
-                summary = text
-            else:
-                summary = abstractive_summary(summarizer, text, requested_max=max_len)
+            summary = batch_summaries.get(i - 1, text)
             # Optional classification
             meta = detect_flags_and_category(text) if classify else {"category": None, "flags": {}, "risk_score": 0}
 
@@ -154,8 +285,7 @@ def process_cases(input_path: str, output_path: str, model_name: str = "google/f
         results.append(entry)
         print(f"  - case {i}: summary_length={len(summary.split())}, classified={classify}")
 
-    with open(output_path, "w", encoding="utf-8") as fh:
-        json.dump(results, fh, ensure_ascii=False, indent=2)
+    write_json(output_path, results)
     print(f"[+] Wrote {len(results)} entries to {output_path}")
 
 
@@ -168,9 +298,12 @@ def cli():
     p.add_argument("--model", default="google/flan-t5-base", help="Summarization model (default google/flan-t5-base)")
     p.add_argument("--max_len", type=int, default=None, help="Optional max length for summaries (tokens)")
     p.add_argument("--classify", action="store_true", help="Include category/flags/risk in output (optional)")
+    p.add_argument("--batch_size", type=int, default=8, help="Number of cases summarized per model forward pass (default 8)")
+    p.add_argument("--quantize", action="store_true", help="Load the summarization model with int8 weights (optional)")
     args = p.parse_args()
 
-    process_cases(args.cases_file, args.out, model_name=args.model, max_len=args.max_len, classify=args.classify)
+    process_cases(args.cases_file, args.out, model_name=args.model, max_len=args.max_len, classify=args.classify,
+                  batch_size=args.batch_size, quantize=args.quantize)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,6 @@
 # tests/test_asr.py
-import os
-import tempfile
+import wave
 import numpy as np
-import soundfile as sf
 import pytest
 from unittest import mock
 
@@ -10,24 +8,47 @@ from unittest import mock
 from ASR import transcribe as asr
 
 def make_tone(duration_s: float, sr: int = 16000, freq: float = 440.0) -> np.ndarray:
-    t = np.linspace(0, duration_s, int(duration_s * sr), endpoint=False)
-    return 0.5 * np.sin(2 * np.pi * freq * t).astype("float32")
+    # build the tone in a single float32 buffer (phase -> sin -> scale in place)
+    n = int(duration_s * sr)
+    out = np.arange(n, dtype=np.float32)
+    np.multiply(out, np.float32(2 * np.pi * freq / sr), out=out)
+    np.sin(out, out=out)
+    np.multiply(out, np.float32(0.5), out=out)
+    return out
 
 def write_wav(path: str, data: np.ndarray, sr: int = 16000):
-    sf.write(path, data, sr)
+    # mono 16-bit PCM via the stdlib writer (the format webrtcvad consumes)
+    pcm = np.clip(data * 32767, -32768, 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
 
-def test_vad_detects_voiced_regions():
-    """VAD should detect two voiced regions separated by silence."""
+@pytest.fixture(scope="session")
+def tone_wavs(tmp_path_factory):
+    """
+    Fixture WAVs synthesized and written once per session:
+    0.5s and 1.0s tones, and a tone/silence/tone burst (0.5s each).
+    """
     sr = 16000
-    tone = make_tone(0.5, sr)
-    silence = np.zeros(int(0.5 * sr), dtype="float32")
-    arr = np.concatenate([tone, silence, tone])
-    with tempfile.TemporaryDirectory() as td:
-        wav_path = os.path.join(td, "burst.wav")
-        write_wav(wav_path, arr, sr)
-        regions = asr.get_voiced_regions(wav_path, aggressiveness=2)
-        # Expect at least 2 voiced regions (depending on VAD aggressiveness)
-        assert len(regions) >= 2, f"expected >=2 voiced regions, got {regions}"
+    wav_dir = tmp_path_factory.mktemp("wavs")
+    short = make_tone(0.5, sr)
+    burst = np.zeros(3 * len(short), dtype="float32")
+    burst[:len(short)] = short
+    burst[2 * len(short):] = short
+    signals = {"tone_0_5s": short, "tone_1s": make_tone(1.0, sr), "burst": burst}
+    paths = {}
+    for name, data in signals.items():
+        paths[name] = str(wav_dir / f"{name}.wav")
+        write_wav(paths[name], data, sr)
+    return paths
+
+def test_vad_detects_voiced_regions(tone_wavs):
+    """VAD should detect two voiced regions separated by silence."""
+    regions = asr.get_voiced_regions(tone_wavs["burst"], aggressiveness=2)
+    # Expect at least 2 voiced regions (depending on VAD aggressiveness)
+    assert len(regions) >= 2, f"expected >=2 voiced regions, got {regions}"
 
 def test_make_chunks_from_voiced_regions_splits_long():
     """Long voiced region must be split into max_len limited chunks with overlap."""
@@ -40,54 +61,41 @@ def test_make_chunks_from_voiced_regions_splits_long():
     for s,e in chunks:
         assert e - s <= asr.MAX_CHUNK_SECONDS + 1e-6
 
-def test_transcribe_audio_file_merges_mocked_segments(monkeypatch):
-    """High-level API should stitch text and merge near segments when backend returns close segments."""
-    # create a short audio file so conversion / slicing works
-    sr = 16000
-    tone = make_tone(1.0, sr)
-    with tempfile.TemporaryDirectory() as td:
-        wav_path = os.path.join(td, "simple.wav")
-        write_wav(wav_path, tone, sr)
+class DummyBackend:
+    """ASRBackend stand-in that avoids loading real models and returns controlled segments."""
+    segments = []
 
-        # monkeypatch ASRBackend to avoid loading real models and to return controlled segments
-        class DummyBackend:
-            def __init__(self, *args, **kwargs):
-                self.backend = "mock"
+    def __init__(self, *args, **kwargs):
+        self.backend = "mock"
 
-            def transcribe_chunk(self, audio_np, sr, offset=0.0, language=None):
-                # Return two segments that are close in time and should be merged by the pipeline.
-                return [
-                    {"start": offset + 0.0, "end": offset + 0.5, "text": "hello"},
-                    {"start": offset + 0.6, "end": offset + 1.0, "text": "world"}
-                ]
+    def transcribe_chunk(self, audio_np, sr, offset=0.0, language=None):
+        return [{"start": offset + s, "end": offset + e, "text": t} for s, e, t in self.segments]
 
-        monkeypatch.setattr(asr, "ASRBackend", DummyBackend)
+@pytest.mark.parametrize(
+    "wav_name,segments,textonly,expected_segments",
+    [
+        # two segments separated by a 0.1s gap -> merged into one (pipeline merges within 0.25s gaps)
+        ("tone_1s", [(0.0, 0.5, "hello"), (0.6, 1.0, "world")], False, 1),
+        # text-only convenience wrapper returns the stitched text as a plain string
+        ("tone_0_5s", [(0.0, 0.5, "hey")], True, None),
+    ],
+    ids=["merges_mocked_segments", "textonly_wrapper"],
+)
+def test_transcribe_with_mocked_backend(monkeypatch, tone_wavs, wav_name, segments, textonly, expected_segments):
+    """High-level API should stitch text (and merge near segments) from the backend's output."""
+    wav_path = tone_wavs[wav_name]
+    monkeypatch.setattr(DummyBackend, "segments", segments)
+    monkeypatch.setattr(asr, "ASRBackend", DummyBackend)
 
+    if textonly:
+        text = asr.transcribe_audio_file_textonly(wav_path, model_name="tiny")
+        assert isinstance(text, str)
+    else:
         # Run the pipeline with VAD aggressiveness high so it produces a single voiced chunk
         out = asr.transcribe_audio_file(wav_path, model_name="small", vad_aggressiveness=2)
-
-        # stitched text should contain 'hello' and 'world'
-        assert "hello" in out["text"]
-        assert "world" in out["text"]
-        # merged result should coalesce adjacent segments into 1 (our pipeline merges within 0.25s gaps)
+        text = out["text"]
         assert isinstance(out["segments"], list)
-        # Because segments were 0.5 and 0.6 separated by 0.1s gap -> they should be merged
-        assert len(out["segments"]) == 1
-
-def test_transcribe_textonly_wrapper(monkeypatch):
-    """text-only convenience wrapper returns same stitched text as dict result."""
-    class DummyBackend2:
-        def __init__(self, *args, **kwargs):
-            pass
-        def transcribe_chunk(self, audio_np, sr, offset=0.0, language=None):
-            return [{"start": offset+0.0, "end": offset+0.5, "text":"hey"}]
+        assert len(out["segments"]) == expected_segments
 
-    monkeypatch.setattr(asr, "ASRBackend", DummyBackend2)
-    sr = 16000
-    tone = make_tone(0.5, sr)
-    with tempfile.TemporaryDirectory() as td:
-        wav_path = os.path.join(td, "one.wav")
-        write_wav(wav_path, tone, sr)
-        text = asr.transcribe_audio_file_textonly(wav_path, model_name="tiny")
-        assert isinstance(text, str)
-        assert "hey" in text
+    for _, _, word in segments:
+        assert word in text
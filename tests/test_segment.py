@@ -0,0 +1,34 @@
+# tests/test_segment.py
+import pytest
+
+from Segment.segment_cases_ml import enforce_min_segment_length
+
+def sentences_with_words(*counts):
+    """One sentence per count, each made of that many words."""
+    return [" ".join(["word"] * n) for n in counts]
+
+@pytest.mark.parametrize(
+    "word_counts, boundaries, min_words, expected",
+    [
+        # empty input: a single empty segment, nothing to merge
+        ((), [], 5, [(0, -1)]),
+        # single tiny segment is kept as is
+        ((3,), [], 5, [(0, 0)]),
+        # long enough segments are left alone
+        ((5, 5), [0], 5, [(0, 0), (1, 1)]),
+        # leading short segment absorbs the next one
+        ((2, 5, 5), [0, 1], 5, [(0, 1), (2, 2)]),
+        # leading short segment keeps absorbing until it is long enough
+        ((1, 1, 1, 5), [0, 1, 2], 3, [(0, 2), (3, 3)]),
+        # middle short segment merges into the previous one
+        ((5, 1, 5), [0, 1], 5, [(0, 1), (2, 2)]),
+        # trailing short segment merges into the previous one
+        ((5, 5, 2), [0, 1], 5, [(0, 0), (1, 2)]),
+        # all segments short: everything ends up in one segment
+        ((1, 1), [0], 5, [(0, 1)]),
+    ],
+)
+def test_enforce_min_segment_length(word_counts, boundaries, min_words, expected):
+    """Short segments are merged exactly as the original per-segment loop did."""
+    sentences = sentences_with_words(*word_counts)
+    assert enforce_min_segment_length(sentences, boundaries, min_words=min_words) == expected
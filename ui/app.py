@@ -1,8 +1,12 @@
-import json
+import shutil
 import subprocess
+import time
+from collections import deque
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
 
 # ========== CONFIG (EDIT IF NEEDED) ====================
@@ -21,12 +25,25 @@ DOCKER_IMAGE = "whisper-pipeline"
 # If your file is speech_to_cases/Pipeline/pipeline.py, this is correct:
 PIPELINE_SCRIPT = "Pipeline/pipeline.py"
 
+# Long-lived container the pipeline is exec'd into, so each run skips
+# container start-up (created on first use, see ensure_pipeline_container)
+PIPELINE_CONTAINER = "whisper-pipeline-svc"
+
 # Subfolder where we store uploaded audio files
 UPLOADS_DIR = PROJECT_ROOT / "uploads"
 
 # Path where pipeline.py writes its final JSON
 PIPELINE_OUTPUT_PATH = PROJECT_ROOT / "pipeline_output.json"
 
+# How many of the most recent pipeline log lines are kept and shown live
+LOG_TAIL_LINES = 200
+
+# Minimum seconds between live log redraws (tqdm progress bars emit many lines per second)
+LOG_REFRESH_SECONDS = 0.3
+
+# Rows per page in the segments table (only the current page is sent to the browser)
+TABLE_PAGE_SIZE = 50
+
 # =======================================================
 
 
@@ -35,47 +52,111 @@ def ensure_uploads_dir() -> None:
     UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def run_docker_pipeline(relative_audio_path: str, cache_dir: str) -> Path:
+@st.cache_resource(show_spinner=False)
+def ensure_pipeline_container(cache_dir: str) -> str:
+    """
+    Start (or restart) the persistent pipeline container with the project
+    and HF cache mounted. Cached per cache_dir for the Streamlit session.
+    """
+    subprocess.run(["docker", "rm", "-f", PIPELINE_CONTAINER], capture_output=True, check=False)
+    try:
+        subprocess.run(
+            [
+                "docker",
+                "run",
+                "-d",
+                "--name",
+                PIPELINE_CONTAINER,
+                "-v",
+                f"{PROJECT_ROOT}:/app",
+                "-v",
+                f"{cache_dir}:/root/.cache/huggingface",
+                "--entrypoint",
+                "sleep",
+                DOCKER_IMAGE,
+                "infinity",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        # docker's own message (missing image, bad mount, ...) is on stderr
+        raise RuntimeError(f"Could not start the pipeline container:\nSTDERR:\n{e.stderr}") from e
+    return PIPELINE_CONTAINER
+
+
+def pipeline_container_running() -> bool:
+    """True if the persistent pipeline container exists and is running."""
+    completed = subprocess.run(
+        ["docker", "inspect", "-f", "{{.State.Running}}", PIPELINE_CONTAINER],
+        capture_output=True,
+        text=True,
+    )
+    return completed.returncode == 0 and completed.stdout.strip() == "true"
+
+
+def run_docker_pipeline(relative_audio_path: str, cache_dir: str, log_slot=None,
+                        precision: str = "fp16") -> Path:
     """
-    Run the Docker pipeline for a given audio file.
+    Run the Docker pipeline for a given audio file
+    (via docker exec in the persistent pipeline container).
 
     relative_audio_path is the path to the audio file
     relative to PROJECT_ROOT (e.g. 'uploads/my_call.wav').
     cache_dir is the HF cache folder on the host (Windows).
+    log_slot is an optional Streamlit placeholder that shows the
+    pipeline output live (only the last LOG_TAIL_LINES lines are kept).
+    precision is forwarded to pipeline.py as --precision (Whisper fp16/int8/fp32).
     """
     # Remove old output if present
     if PIPELINE_OUTPUT_PATH.exists():
         PIPELINE_OUTPUT_PATH.unlink()
 
-    # Volume mounts for Docker
-    project_vol = f"{PROJECT_ROOT}:/app"
-    cache_vol = f"{cache_dir}:/root/.cache/huggingface"
+    # Reuse the running container; recreate it if it was stopped or removed
+    container = ensure_pipeline_container(cache_dir)
+    if not pipeline_container_running():
+        ensure_pipeline_container.clear()
+        container = ensure_pipeline_container(cache_dir)
 
     cmd = [
         "docker",
-        "run",
-        "--rm",
-        "-v",
-        project_vol,
-        "-v",
-        cache_vol,
-        DOCKER_IMAGE,
+        "exec",
+        "-e",
+        "PYTHONUNBUFFERED=1",   # flush prints line by line so logs stream
+        container,
         "python",
         PIPELINE_SCRIPT,        # <--- run Pipeline/pipeline.py
         relative_audio_path,
+        "--precision",
+        precision,
     ]
 
-    # Run the command from the project root so paths line up
-    completed = subprocess.run(
+    # Run the command from the project root so paths line up.
+    # Output is streamed line by line into a bounded buffer instead of
+    # being captured whole, so memory stays flat on long runs.
+    log_tail = deque(maxlen=LOG_TAIL_LINES)
+    last_refresh = 0.0
+    with subprocess.Popen(
         cmd,
         cwd=PROJECT_ROOT,
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
         text=True,
-    )
-
-    if completed.returncode != 0:
+        bufsize=1,
+    ) as proc:
+        for line in proc.stdout:
+            log_tail.append(line)
+            # redraw at most every LOG_REFRESH_SECONDS rather than once per line
+            if log_slot is not None and time.monotonic() - last_refresh >= LOG_REFRESH_SECONDS:
+                log_slot.code("".join(log_tail))
+                last_refresh = time.monotonic()
+    if log_slot is not None:
+        log_slot.code("".join(log_tail))
+
+    if proc.returncode != 0:
         raise RuntimeError(
-            f"Docker pipeline failed:\nSTDOUT:\n{completed.stdout}\n\nSTDERR:\n{completed.stderr}"
+            f"Docker pipeline failed:\nOUTPUT (last {LOG_TAIL_LINES} lines):\n{''.join(log_tail)}"
         )
 
     if not PIPELINE_OUTPUT_PATH.exists():
@@ -86,28 +167,62 @@ def run_docker_pipeline(relative_audio_path: str, cache_dir: str) -> Path:
     return PIPELINE_OUTPUT_PATH
 
 
-def load_pipeline_output(path: Path) -> pd.DataFrame:
-    """Load pipeline_output.json into a DataFrame."""
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+# Column dtypes applied while parsing pipeline_output.json. Arrow-backed strings
+# hand over to st.dataframe without conversion and use Arrow's string kernels
+# for .str.contains (pyarrow is a Streamlit dependency).
+PIPELINE_OUTPUT_DTYPES = {"case_index": "int32", "text": "string[pyarrow]", "summary": "string[pyarrow]"}
+
 
-    if not isinstance(data, list):
+@st.cache_data(show_spinner=False, max_entries=1)
+def load_pipeline_output(path_str: str, mtime: float) -> pd.DataFrame:
+    """
+    Load pipeline_output.json into a DataFrame.
+
+    Cached across Streamlit reruns; mtime is only part of the cache key,
+    so a file rewritten by a new pipeline run is loaded again. Only the
+    latest file is kept, older entries are evicted.
+    """
+    path = Path(path_str)
+    # Cheap shape check on the first byte instead of parsing the file in Python
+    with path.open("rb") as f:
+        head = f.read(64).lstrip()
+    if not head.startswith(b"["):
         raise ValueError("pipeline_output.json is not a list of objects.")
 
-    df = pd.DataFrame(data)
+    # pandas' C JSON parser builds the frame directly with typed columns
+    df = pd.read_json(path, orient="records", dtype=PIPELINE_OUTPUT_DTYPES, convert_dates=False)
 
-    # Ensure expected columns exist
-    for col in ["case_index", "text", "summary"]:
-        if col not in df.columns:
-            df[col] = ""
+    # Ensure expected columns exist (other columns such as flags are kept)
+    expected = list(PIPELINE_OUTPUT_DTYPES)
+    df = df.reindex(columns=expected + [c for c in df.columns if c not in expected], fill_value="")
+    # columns added by reindex start as plain objects
+    df = df.astype({"text": PIPELINE_OUTPUT_DTYPES["text"], "summary": PIPELINE_OUTPUT_DTYPES["summary"]})
 
     # Sort nicely
     if "case_index" in df.columns:
-        df = df.sort_values("case_index").reset_index(drop=True)
+        # indexed by case_index (column kept) so a selected segment is found with .loc
+        df = df.sort_values("case_index").set_index("case_index", drop=False)
 
     return df
 
 
+# Columns the search box matches against
+SEARCH_COLUMNS = ("text", "summary")
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_search_columns(path_str: str, mtime: float) -> dict:
+    """
+    Lowercased Arrow copies of the searchable columns, row-aligned with
+    load_pipeline_output(path_str, mtime).
+
+    Built once per output file, so a search only runs the substring kernel
+    instead of lowercasing every row again on each keystroke.
+    """
+    df = load_pipeline_output(path_str, mtime)
+    return {col: pc.utf8_lower(pa.array(df[col])) for col in SEARCH_COLUMNS}
+
+
 def main():
     st.set_page_config(
         page_title="Speech-to-Cases Dashboard",
@@ -135,6 +250,13 @@ def main():
             value=DEFAULT_HF_CACHE_DIR,
         )
 
+        st.markdown("**3. Whisper precision**")
+        precision = st.selectbox(
+            "Precision (fp16 = GPU half precision, int8 = quantized CPU)",
+            ["fp16", "int8", "fp32"],
+            index=0,
+        )
+
         run_button = st.button("▶ Run pipeline", type="primary")
 
     # -------- MAIN LOGIC --------
@@ -152,8 +274,9 @@ def main():
 
         # Save uploaded file to uploads/ inside project root
         audio_dest = UPLOADS_DIR / uploaded_file.name
+        # Stream in 1 MiB chunks rather than reading the whole upload into memory
         with audio_dest.open("wb") as f:
-            f.write(uploaded_file.read())
+            shutil.copyfileobj(uploaded_file, f, length=1 << 20)
 
         # Path relative to project root, Docker sees it under /app
         relative_audio_path = audio_dest.relative_to(PROJECT_ROOT).as_posix()
@@ -163,26 +286,38 @@ def main():
         # Run the Docker pipeline
         with st.spinner("Running Docker pipeline: ASR → segmentation → summarization..."):
             try:
-                output_path = run_docker_pipeline(relative_audio_path, cache_dir)
+                output_path = run_docker_pipeline(
+                    relative_audio_path, cache_dir, log_slot=st.empty(), precision=precision
+                )
             except Exception as e:
+                st.session_state["has_pipeline_output"] = False
                 st.error(f"Pipeline failed: {e}")
                 return
 
+        st.session_state["has_pipeline_output"] = True
         st.success(f"Pipeline completed. Output: {output_path}")
-
-        # Load and display results
-        try:
-            df = load_pipeline_output(output_path)
-        except Exception as e:
-            st.error(f"Failed to load pipeline_output.json: {e}")
-            return
-
-        show_results(df)
+    elif st.session_state.get("has_pipeline_output") and PIPELINE_OUTPUT_PATH.exists():
+        # Widget interactions (search, selection) rerun the script without the
+        # button pressed: keep showing this session's last output, served from the cache
+        output_path = PIPELINE_OUTPUT_PATH
     else:
         st.info("Upload an audio file and click **Run pipeline** to start.")
+        return
+
+    # Load and display results
+    try:
+        # one stat() so both caches are keyed on the same version of the file
+        mtime = output_path.stat().st_mtime
+        df = load_pipeline_output(str(output_path), mtime)
+        search_columns = load_search_columns(str(output_path), mtime)
+    except Exception as e:
+        st.error(f"Failed to load pipeline_output.json: {e}")
+        return
+
+    show_results(df, search_columns)
 
 
-def show_results(df: pd.DataFrame) -> None:
+def show_results(df: pd.DataFrame, search_columns: dict = None) -> None:
     """Render the segmentation + summarization results."""
     st.subheader("Segments overview")
 
@@ -193,19 +328,32 @@ def show_results(df: pd.DataFrame) -> None:
         placeholder="e.g. withdrawal, verification, payment...",
     )
 
-    filtered_df = df.copy()
-    if search_query:
+    # No copy: the frame is only read, and filtering selects a view of matching rows
+    filtered_df = df
+    if search_query and search_columns is not None:
+        # Literal match on the pre-lowercased columns, OR-ed in Arrow; null rows don't match
+        needle = search_query.lower()
+        mask = pc.or_kleene(*(pc.match_substring(search_columns[col], needle) for col in SEARCH_COLUMNS))
+        filtered_df = df.loc[pc.fill_null(mask, False).to_numpy(zero_copy_only=False)]
+    elif search_query:
+        # Plain substring match: no per-call regex compilation, and characters
+        # like "." or "(" in the query are matched literally
         mask = (
-            df["text"].str.contains(search_query, case=False, na=False)
-            | df["summary"].str.contains(search_query, case=False, na=False)
+            df["text"].str.contains(search_query, case=False, na=False, regex=False)
+            | df["summary"].str.contains(search_query, case=False, na=False, regex=False)
         )
-        filtered_df = df[mask]
+        filtered_df = df.loc[mask]
 
     st.write(f"Showing {len(filtered_df)} of {len(df)} segments")
 
-    # Compact table view
+    # Compact table view, one page at a time
+    n_pages = max(1, -(-len(filtered_df) // TABLE_PAGE_SIZE))
+    page = 1
+    if n_pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+    page_df = filtered_df.iloc[(page - 1) * TABLE_PAGE_SIZE: page * TABLE_PAGE_SIZE]
     st.dataframe(
-        filtered_df[["case_index", "summary"]],
+        page_df[["case_index", "summary"]].reset_index(drop=True),
         use_container_width=True,
         height=300,
     )
@@ -222,7 +370,10 @@ def show_results(df: pd.DataFrame) -> None:
         "Select segment (case_index)", options=case_indices
     )
 
-    selected_row = df[df["case_index"] == selected_case_index].iloc[0]
+    selected_row = filtered_df.loc[selected_case_index]
+    if isinstance(selected_row, pd.DataFrame):
+        # duplicate case_index values: show the first, as before
+        selected_row = selected_row.iloc[0]
 
     st.markdown(f"### Segment #{selected_case_index}")
 